@@ -17,5 +17,13 @@ class Config:
     TOP_K_RESULTS: int = 5
     
     EMBEDDING_DIMENSION: int = 768
+    EMBEDDING_BATCH_SIZE: int = 100
+    
+    # Optional partitioning of the chunks table: "" (plain table), "hash" (by document_id) or "list" (by category).
+    CHUNKS_PARTITIONING: str = os.getenv("CHUNKS_PARTITIONING", "")
+    CHUNKS_HASH_PARTITIONS: int = int(os.getenv("CHUNKS_HASH_PARTITIONS", "8"))
+    SEARCH_FANOUT_WORKERS: int = 8
+    MAINTENANCE_LOCK_TIMEOUT_MS: int = 5000
+    MAINTENANCE_LOCK_RETRIES: int = 20
 
 config = Config()
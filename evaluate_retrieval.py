@@ -0,0 +1,201 @@
+import argparse
+import json
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+from config import config
+from infra.database import db
+from infra.partitioning import list_partitions
+from services.embeddings import embedding_service
+from services.vector_store import vector_store
+
+
+def load_questions(path: str) -> List[Dict]:
+    """
+    Reads a JSONL file where each line holds a "question" and the
+    "expected_document" (filename) that should be retrieved for it.
+    """
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if "question" not in item or "expected_document" not in item:
+                raise ValueError(f"Line {line_number}: expected 'question' and 'expected_document' keys")
+            questions.append(item)
+    return questions
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, round(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def first_match_rank(results: List[Dict], expected_document: str) -> Optional[int]:
+    for rank, result in enumerate(results, start=1):
+        if result["filename"] == expected_document:
+            return rank
+    return None
+
+
+def evaluate_configuration(
+    questions: List[Dict],
+    query_embeddings: List[List[float]],
+    ks: List[int],
+    batch_size: int,
+    latency_indices: List[int],
+    ef_search: Optional[int] = None,
+) -> Dict:
+    """
+    Runs every question against the index with the given ANN settings in
+    batches to compute recall@k and MRR, then times the questions at
+    latency_indices one search_similar call at a time for latency percentiles.
+    """
+    max_k = max(ks)
+    ranks: List[Optional[int]] = []
+    for start in range(0, len(questions), batch_size):
+        batch = query_embeddings[start:start + batch_size]
+        batch_results = vector_store.search_similar_batch(batch, top_k=max_k, ef_search=ef_search)
+        for item, results in zip(questions[start:start + batch_size], batch_results):
+            ranks.append(first_match_rank(results, item["expected_document"]))
+
+    latencies_ms: List[float] = []
+    for idx in latency_indices:
+        started = time.perf_counter()
+        vector_store.search_similar(query_embeddings[idx], top_k=max_k, ef_search=ef_search)
+        latencies_ms.append((time.perf_counter() - started) * 1000)
+
+    total = len(questions)
+    return {
+        "ef_search": ef_search,
+        "recall": {k: sum(1 for r in ranks if r is not None and r <= k) / total for k in ks},
+        "mrr": sum(1 / r for r in ranks if r is not None) / total,
+        "latency_samples": len(latencies_ms),
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+        },
+    }
+
+
+def print_report(report: Dict, ks: List[int]):
+    ef_search = report["ef_search"]
+    print(f"Configuration: {f'ef_search={ef_search}' if ef_search is not None else 'defaults'}")
+    for k in ks:
+        print(f"  recall@{k}: {report['recall'][k]:.3f}")
+    print(f"  MRR: {report['mrr']:.3f}")
+    latency = report["latency_ms"]
+    print(
+        f"  per-query latency ms ({report['latency_samples']} queries): "
+        f"p50={latency['p50']:.1f} p95={latency['p95']:.1f} p99={latency['p99']:.1f}"
+    )
+
+
+def tables_without_hnsw_index(conn) -> List[str]:
+    """Tables searched for chunks (the partitions, or chunks itself) that have no HNSW index."""
+    with conn.cursor() as cur:
+        tables = list_partitions(cur) or ["chunks"]
+        cur.execute(
+            """
+            SELECT t.relname
+            FROM unnest(%s::text[]) AS t(relname)
+            WHERE NOT EXISTS (
+                SELECT 1
+                FROM pg_index i
+                JOIN pg_class ic ON ic.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = ic.relam
+                WHERE i.indrelid = to_regclass(t.relname) AND am.amname = 'hnsw'
+            )
+            """,
+            (tables,)
+        )
+        missing = [row[0] for row in cur.fetchall()]
+    conn.rollback()
+    return missing
+
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Evaluate retrieval quality against a labelled question set. "
+                    "Only query-time settings are swept; index build parameters (m, ef_construction) "
+                    "need the indexes rebuilt and are compared across separate runs."
+    )
+    parser.add_argument("questions", help="JSONL file with 'question' and 'expected_document' per line")
+    parser.add_argument("--k", type=parse_int_list, default=[1, config.TOP_K_RESULTS],
+                        help="Comma-separated cut-offs for recall@k (default: 1,TOP_K_RESULTS)")
+    parser.add_argument("--batch-size", type=int, default=config.EMBEDDING_BATCH_SIZE,
+                        help="Number of queries per search statement in the recall pass")
+    parser.add_argument("--latency-sample", type=int, default=500,
+                        help="Number of questions timed one query at a time (0 for all)")
+    parser.add_argument("--ef-search", type=parse_int_list, default=[],
+                        help="Comma-separated hnsw.ef_search values to sweep")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of configurations evaluated in parallel (latencies then include load from the others)")
+    parser.add_argument("--output", help="Optional path to write the reports as JSON")
+    args = parser.parse_args()
+
+    if not args.k or min(args.k) < 1:
+        parser.error("--k needs at least one cut-off, each 1 or greater")
+    if args.batch_size < 1 or args.workers < 1:
+        parser.error("--batch-size and --workers must be 1 or greater")
+    if args.latency_sample < 0:
+        parser.error("--latency-sample must be 0 or greater")
+    if args.ef_search:
+        missing = tables_without_hnsw_index(db.connect())
+        if missing:
+            parser.error(
+                f"--ef-search has no effect without an HNSW index, and these tables have none: {', '.join(missing)}. "
+                "Run initialize_db.py to create it."
+            )
+
+    ks = sorted(set(args.k))
+    questions = load_questions(args.questions)
+    if not questions:
+        print("No questions found.")
+        return
+
+    print(f"Embedding {len(questions)} questions...")
+    query_embeddings = embedding_service.generate_query_embeddings_batch(
+        [item["question"] for item in questions]
+    )
+
+    if args.latency_sample and args.latency_sample < len(questions):
+        # A fixed seed times the same questions for every configuration.
+        latency_indices = sorted(random.Random(0).sample(range(len(questions)), args.latency_sample))
+    else:
+        latency_indices = list(range(len(questions)))
+
+    sweep = args.ef_search or [None]
+    print(f"Evaluating {len(sweep)} configuration(s)...")
+    if args.workers > 1 and len(sweep) > 1:
+        print("Note: configurations run in parallel against the same database, so reported latencies include load from each other.")
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(evaluate_configuration, questions, query_embeddings, ks, args.batch_size, latency_indices, ef_search)
+            for ef_search in sweep
+        ]
+        reports = [future.result() for future in futures]
+
+    for report in reports:
+        print_report(report, ks)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+        print(f"Reports written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import psycopg
+import threading
 from typing import Optional
 from config import config
 from pgvector.psycopg import register_vector
@@ -6,13 +7,28 @@ from pgvector.psycopg import register_vector
 class Database:
     def __init__(self):
         self.conn: Optional[psycopg.Connection] = None
+        self._local = threading.local()
+    
+    def open_connection(self) -> psycopg.Connection:
+        """Opens a new connection, independent of the shared one, for use from worker threads."""
+        conn = psycopg.connect(config.DATABASE_URL)
+        register_vector(conn)
+        return conn
     
     def connect(self):
         if not self.conn or self.conn.closed:
-            self.conn = psycopg.connect(config.DATABASE_URL)
-            register_vector(self.conn)
+            self.conn = self.open_connection()
         return self.conn
     
+    def thread_connection(self) -> psycopg.Connection:
+        """Returns a per-thread autocommit connection, reused across calls from the same worker thread."""
+        conn = getattr(self._local, "conn", None)
+        if not conn or conn.closed:
+            conn = self.open_connection()
+            conn.autocommit = True
+            self._local.conn = conn
+        return conn
+    
     def get_cursor(self):
         conn = self.connect()
         return conn.cursor()
@@ -0,0 +1,400 @@
+import hashlib
+import re
+import time
+from typing import Callable, List, Optional, Tuple
+from psycopg import errors, sql
+from config import config
+
+PARTITION_SCHEMES = ("hash", "list")
+CHUNK_COLUMNS = ("id", "document_id", "category", "chunk_text", "embedding")
+DEFAULT_PARTITION = "chunks_default"
+
+
+def hash_partition_name(modulus: int, remainder: int) -> str:
+    return f"chunks_h{modulus}_{remainder}"
+
+
+def category_partition_name(category: str) -> str:
+    # The hash keeps categories that slug alike apart; the slug is cut so that
+    # "<name>_embedding_idx" stays within Postgres's 63-character identifier limit.
+    slug = re.sub(r"[^a-z0-9]+", "_", category.lower())[:28].strip("_")
+    digest = hashlib.sha1(category.encode("utf-8")).hexdigest()[:8]
+    return f"chunks_cat_{slug or 'blank'}_{digest}"
+
+
+def get_partitioning_scheme(cur, table: str = "chunks") -> Optional[str]:
+    """Returns "hash" or "list" for a partitioned table, None for a plain (or missing) one."""
+    cur.execute(
+        """
+        SELECT p.partstrat
+        FROM pg_partitioned_table p
+        WHERE p.partrelid = to_regclass(%s)
+        """,
+        (table,)
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return {"h": "hash", "l": "list"}.get(row[0])
+
+
+def list_partitions(cur, table: str = "chunks") -> List[str]:
+    cur.execute(
+        """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+        """,
+        (table,)
+    )
+    return [row[0] for row in cur.fetchall()]
+
+
+def get_hash_bounds(cur, partition: str) -> Tuple[int, int]:
+    """Returns (modulus, remainder) of a hash partition."""
+    cur.execute("SELECT pg_get_expr(relpartbound, oid) FROM pg_class WHERE oid = to_regclass(%s)", (partition,))
+    row = cur.fetchone()
+    match = re.search(r"modulus (\d+), remainder (\d+)", row[0] if row and row[0] else "")
+    if not match:
+        raise ValueError(f"{partition} is not a hash partition")
+    return int(match.group(1)), int(match.group(2))
+
+
+def create_partition_index(cur, partition: str):
+    """Builds the ANN index for a single partition, or for the plain chunks table."""
+    cur.execute(
+        sql.SQL("CREATE INDEX IF NOT EXISTS {} ON {} USING hnsw (embedding vector_cosine_ops)").format(
+            sql.Identifier(f"{partition}_embedding_idx"),
+            sql.Identifier(partition)
+        )
+    )
+
+
+def create_partitioned_chunks(cur, table: str, scheme: str, partitions: int = 0, categories: Optional[List[str]] = None, with_index: bool = True):
+    """
+    Creates a partitioned chunks table with its partitions and, unless
+    with_index is False (bulk loads), one ANN index per partition. Ids come
+    from chunks_id_seq so that rows keep their ids when migrated from the
+    plain table.
+    """
+    if scheme not in PARTITION_SCHEMES:
+        raise ValueError(f"Unsupported partitioning scheme: {scheme}")
+
+    cur.execute("CREATE SEQUENCE IF NOT EXISTS chunks_id_seq")
+    if scheme == "hash":
+        # The partition key has to be part of the primary key.
+        key = sql.SQL("PRIMARY KEY (id, document_id)")
+        partition_by = sql.SQL("PARTITION BY HASH (document_id)")
+    else:
+        # category may be NULL, so it cannot be part of a primary key.
+        key = sql.SQL("UNIQUE (id, category)")
+        partition_by = sql.SQL("PARTITION BY LIST (category)")
+    cur.execute(
+        sql.SQL("""
+            CREATE TABLE {} (
+                id INTEGER NOT NULL DEFAULT nextval('chunks_id_seq'),
+                document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+                category VARCHAR(100),
+                chunk_text TEXT,
+                embedding VECTOR({}),
+                {}
+            ) {}
+        """).format(sql.Identifier(table), sql.Literal(config.EMBEDDING_DIMENSION), key, partition_by)
+    )
+
+    if scheme == "hash":
+        for remainder in range(partitions):
+            create_hash_partition(cur, table, partitions, remainder, with_index)
+    else:
+        cur.execute(
+            sql.SQL("CREATE TABLE {} PARTITION OF {} DEFAULT").format(
+                sql.Identifier(DEFAULT_PARTITION), sql.Identifier(table)
+            )
+        )
+        if with_index:
+            create_partition_index(cur, DEFAULT_PARTITION)
+        for category in categories or []:
+            create_category_partition(cur, table, category, with_index)
+
+
+def create_hash_partition(cur, table: str, modulus: int, remainder: int, with_index: bool = True) -> str:
+    name = hash_partition_name(modulus, remainder)
+    cur.execute(
+        sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES WITH (MODULUS {}, REMAINDER {})").format(
+            sql.Identifier(name), sql.Identifier(table), sql.Literal(modulus), sql.Literal(remainder)
+        )
+    )
+    if with_index:
+        create_partition_index(cur, name)
+    return name
+
+
+def create_category_partition(cur, table: str, category: str, with_index: bool = True) -> str:
+    """
+    Adds a list partition for one category to a table whose default partition
+    is still empty (i.e. while it is being created). Use add_category_partition
+    on a table that is in use.
+    """
+    name = category_partition_name(category)
+    cur.execute(
+        sql.SQL("CREATE TABLE {} PARTITION OF {} FOR VALUES IN ({})").format(
+            sql.Identifier(name), sql.Identifier(table), sql.Literal(category)
+        )
+    )
+    if with_index:
+        create_partition_index(cur, name)
+    return name
+
+
+def install_change_log(cur, source: str, log: str):
+    """
+    Records the id of every chunk inserted, updated or deleted in source into
+    the log table, so rows copied out of source while it is in use can be
+    brought up to date afterwards with apply_change_log.
+    """
+    cur.execute(
+        sql.SQL("CREATE TABLE {} (seq BIGSERIAL PRIMARY KEY, chunk_id INTEGER NOT NULL)").format(sql.Identifier(log))
+    )
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION chunks_log_change() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                EXECUTE format('INSERT INTO %I (chunk_id) VALUES ($1)', TG_ARGV[0]) USING OLD.id;
+                RETURN OLD;
+            END IF;
+            EXECUTE format('INSERT INTO %I (chunk_id) VALUES ($1)', TG_ARGV[0]) USING NEW.id;
+            RETURN NEW;
+        END
+        $$
+    """)
+    cur.execute(
+        sql.SQL("CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {} FOR EACH ROW EXECUTE FUNCTION chunks_log_change({})").format(
+            sql.Identifier(f"{log}_trigger"), sql.Identifier(source), sql.Literal(log)
+        )
+    )
+
+
+def remove_change_log(cur, source: str, log: str):
+    if _table_exists(cur, source):
+        cur.execute(
+            sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(sql.Identifier(f"{log}_trigger"), sql.Identifier(source))
+        )
+    cur.execute(sql.SQL("DROP TABLE IF EXISTS {}").format(sql.Identifier(log)))
+
+
+def get_change_log_position(cur, log: str) -> int:
+    cur.execute(sql.SQL("SELECT COALESCE(MAX(seq), 0) FROM {}").format(sql.Identifier(log)))
+    return cur.fetchone()[0]
+
+
+def apply_change_log(cur, log: str, target: str, source_rows: sql.Composable, position: int):
+    """
+    Brings target up to date for every chunk id logged up to position: the
+    target rows are dropped and re-read from source_rows (a SELECT of
+    CHUNK_COLUMNS), so rows deleted from the source stay deleted and applying
+    the same entries twice is harmless.
+    """
+    logged_ids = sql.SQL("SELECT chunk_id FROM {} WHERE seq <= %s").format(sql.Identifier(log))
+    cur.execute(
+        sql.SQL("DELETE FROM {} WHERE id IN ({})").format(sql.Identifier(target), logged_ids),
+        (position,)
+    )
+    cur.execute(
+        sql.SQL("INSERT INTO {} ({}) SELECT s.* FROM ({}) s WHERE s.id IN ({})").format(
+            sql.Identifier(target), _columns(), source_rows, logged_ids
+        ),
+        (position,)
+    )
+
+
+def trim_change_log(cur, log: str, position: int):
+    cur.execute(sql.SQL("DELETE FROM {} WHERE seq <= %s").format(sql.Identifier(log)), (position,))
+
+
+def run_locked(conn, table: str, step: Callable):
+    """
+    Runs step(cur) in its own transaction holding ACCESS EXCLUSIVE on table
+    (and so on its partitions). Every lock in the transaction is taken under
+    MAINTENANCE_LOCK_TIMEOUT_MS: while a lock request waits, all new queries on
+    the table queue behind it, so rather than wait out a long-running
+    transaction the step is rolled back and retried after a pause.
+    """
+    for attempt in range(1, config.MAINTENANCE_LOCK_RETRIES + 1):
+        with conn.cursor() as cur:
+            try:
+                cur.execute("SELECT set_config('lock_timeout', %s, true)", (f"{config.MAINTENANCE_LOCK_TIMEOUT_MS}ms",))
+                cur.execute(sql.SQL("LOCK TABLE {} IN ACCESS EXCLUSIVE MODE").format(sql.Identifier(table)))
+                step(cur)
+                conn.commit()
+                return
+            except (errors.LockNotAvailable, errors.DeadlockDetected):
+                conn.rollback()
+                if attempt == config.MAINTENANCE_LOCK_RETRIES:
+                    raise
+                time.sleep(min(attempt, 10))
+
+
+def add_category_partition(conn, table: str, category: str) -> str:
+    """
+    Adds a list partition for a category to a table that is in use. The new
+    partition is filled from the default partition and indexed as a
+    standalone table; only the final catch-up, the delete from the default
+    partition and the ATTACH run while the table is locked (see run_locked). A
+    CHECK constraint matching the bound lets ATTACH skip validating the new
+    partition, but Postgres still scans the default partition to confirm no
+    rows of the category remain there.
+    """
+    name = category_partition_name(category)
+    log = f"{name}_log"
+    bound = sql.SQL("category IS NOT NULL AND category = {}").format(sql.Literal(category))
+    source_rows = sql.SQL("SELECT {} FROM {} WHERE {}").format(_columns(), sql.Identifier(DEFAULT_PARTITION), bound)
+
+    with conn.cursor() as cur:
+        try:
+            install_change_log(cur, DEFAULT_PARTITION, log)
+            _create_standalone_partition(cur, table, name, bound)
+            conn.commit()
+
+            _fill_and_index(conn, cur, log, [(name, source_rows)])
+
+            def attach(cur):
+                apply_change_log(cur, log, name, source_rows, get_change_log_position(cur, log))
+                cur.execute(
+                    sql.SQL("DELETE FROM {} WHERE category = %s").format(sql.Identifier(DEFAULT_PARTITION)),
+                    (category,)
+                )
+                cur.execute(
+                    sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES IN ({})").format(
+                        sql.Identifier(table), sql.Identifier(name), sql.Literal(category)
+                    )
+                )
+                cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.Identifier(name), sql.Identifier(f"{name}_bound")))
+                remove_change_log(cur, DEFAULT_PARTITION, log)
+
+            run_locked(conn, table, attach)
+        except Exception:
+            _abandon(conn, cur, DEFAULT_PARTITION, log, [name])
+            raise
+    return name
+
+
+def split_hash_partition(conn, table: str, partition: str) -> List[str]:
+    """
+    Replaces a hash partition (modulus m, remainder r) with two partitions
+    (2m, r) and (2m, r + m), so the corpus can grow one partition at a time.
+    The new partitions are filled and indexed as standalone tables while the
+    old one stays attached; the table is locked only to apply the changes
+    made meanwhile and swap the partitions. CHECK constraints matching the
+    new bounds let ATTACH skip validating them.
+    """
+    with conn.cursor() as cur:
+        modulus, remainder = get_hash_bounds(cur, partition)
+        cur.execute("SELECT to_regclass(%s)::oid", (table,))
+        table_oid = cur.fetchone()[0]
+        log = f"{partition}_split_log"
+
+        new_partitions = []
+        for new_remainder in (remainder, remainder + modulus):
+            name = hash_partition_name(modulus * 2, new_remainder)
+            # The same expression Postgres uses as the partition constraint.
+            bound = sql.SQL("satisfies_hash_partition({}::oid, {}, {}, document_id)").format(
+                sql.Literal(str(table_oid)), sql.Literal(modulus * 2), sql.Literal(new_remainder)
+            )
+            source_rows = sql.SQL("SELECT {} FROM {} WHERE {}").format(_columns(), sql.Identifier(partition), bound)
+            new_partitions.append((name, new_remainder, bound, source_rows))
+        names = [name for name, _, _, _ in new_partitions]
+
+        try:
+            install_change_log(cur, partition, log)
+            for name, _, bound, _ in new_partitions:
+                _create_standalone_partition(cur, table, name, bound)
+            conn.commit()
+
+            _fill_and_index(conn, cur, log, [(name, source_rows) for name, _, _, source_rows in new_partitions])
+
+            def swap(cur):
+                position = get_change_log_position(cur, log)
+                for name, _, _, source_rows in new_partitions:
+                    apply_change_log(cur, log, name, source_rows, position)
+                cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(sql.Identifier(table), sql.Identifier(partition)))
+                for name, new_remainder, _, _ in new_partitions:
+                    cur.execute(
+                        sql.SQL("ALTER TABLE {} ATTACH PARTITION {} FOR VALUES WITH (MODULUS {}, REMAINDER {})").format(
+                            sql.Identifier(table), sql.Identifier(name), sql.Literal(modulus * 2), sql.Literal(new_remainder)
+                        )
+                    )
+                    cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT {}").format(sql.Identifier(name), sql.Identifier(f"{name}_bound")))
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+                cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(log)))
+
+            run_locked(conn, table, swap)
+        except Exception:
+            _abandon(conn, cur, partition, log, names)
+            raise
+    return names
+
+
+def _columns() -> sql.Composable:
+    return sql.SQL(", ").join(map(sql.Identifier, CHUNK_COLUMNS))
+
+
+def _table_exists(cur, table: str) -> bool:
+    cur.execute("SELECT to_regclass(%s)", (table,))
+    return cur.fetchone()[0] is not None
+
+
+def _create_standalone_partition(cur, table: str, name: str, bound: sql.Composable):
+    """
+    Creates a table shaped like a partition of table, with the indexes and
+    foreign key ATTACH would otherwise build under lock, and a CHECK on the
+    partition bound.
+    """
+    cur.execute(
+        sql.SQL("CREATE TABLE {} (LIKE {} INCLUDING DEFAULTS INCLUDING INDEXES)").format(
+            sql.Identifier(name), sql.Identifier(table)
+        )
+    )
+    cur.execute(
+        sql.SQL("ALTER TABLE {} ADD FOREIGN KEY (document_id) REFERENCES documents(id) ON DELETE CASCADE").format(
+            sql.Identifier(name)
+        )
+    )
+    cur.execute(
+        sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} CHECK ({})").format(
+            sql.Identifier(name), sql.Identifier(f"{name}_bound"), bound
+        )
+    )
+
+
+def _fill_and_index(conn, cur, log: str, targets: List[Tuple[str, sql.Composable]]):
+    """Bulk-copies and indexes standalone tables, then applies the changes logged meanwhile, without locks on the parent."""
+    for name, source_rows in targets:
+        cur.execute(sql.SQL("INSERT INTO {} ({}) {}").format(sql.Identifier(name), _columns(), source_rows))
+        conn.commit()
+        # Building the ANN index after the rows are in place is much faster than maintaining it row by row.
+        create_partition_index(cur, name)
+        conn.commit()
+    position = get_change_log_position(cur, log)
+    for name, source_rows in targets:
+        apply_change_log(cur, log, name, source_rows, position)
+    trim_change_log(cur, log, position)
+    conn.commit()
+
+
+def _abandon(conn, cur, source: str, log: str, tables: List[str]):
+    """Removes the change log and the standalone tables left by a failed online operation."""
+    conn.rollback()
+    remove_change_log(cur, source, log)
+    for name in tables:
+        if _table_exists(cur, name) and not _is_partition(cur, name):
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(name)))
+    conn.commit()
+
+
+def _is_partition(cur, table: str) -> bool:
+    cur.execute("SELECT relispartition FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row and row[0])
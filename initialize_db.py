@@ -1,5 +1,6 @@
 import psycopg
 from config import config
+from infra.partitioning import create_partition_index, create_partitioned_chunks, get_partitioning_scheme
 
 def initialize_database():
     """
@@ -26,15 +27,40 @@ def initialize_database():
             );
         """)
 
-        print("Creating 'chunks' table...")
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS chunks (
-                id SERIAL PRIMARY KEY,
-                document_id INTEGER REFERENCES documents(id) ON DELETE CASCADE,
-                chunk_text TEXT,
-                embedding VECTOR({config.EMBEDDING_DIMENSION})
-            );
-        """)
+        cursor.execute("SELECT to_regclass('chunks')")
+        chunks_exists = cursor.fetchone()[0] is not None
+
+        if config.CHUNKS_PARTITIONING and not chunks_exists:
+            print(f"Creating partitioned 'chunks' table ({config.CHUNKS_PARTITIONING})...")
+            create_partitioned_chunks(
+                cursor,
+                "chunks",
+                config.CHUNKS_PARTITIONING,
+                partitions=config.CHUNKS_HASH_PARTITIONS,
+            )
+        else:
+            if config.CHUNKS_PARTITIONING and not get_partitioning_scheme(cursor):
+                print(
+                    "⚠️ 'chunks' already exists and is not partitioned, so CHUNKS_PARTITIONING is ignored. "
+                    "Run 'python manage_partitions.py migrate' to partition it."
+                )
+            else:
+                print("Creating 'chunks' table...")
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id SERIAL PRIMARY KEY,
+                    document_id INTEGER REFERENCES documents(id) ON DELETE CASCADE,
+                    category VARCHAR(100),
+                    chunk_text TEXT,
+                    embedding VECTOR({config.EMBEDDING_DIMENSION})
+                );
+            """)
+            # Tables created before chunks carried their document's category.
+            cursor.execute("ALTER TABLE chunks ADD COLUMN IF NOT EXISTS category VARCHAR(100);")
+
+            if not get_partitioning_scheme(cursor):
+                print("Creating HNSW index on 'chunks'...")
+                create_partition_index(cursor, "chunks")
 
         # Commit the changes
         conn.commit()
@@ -0,0 +1,195 @@
+import argparse
+from typing import List
+from psycopg import sql
+from config import config
+from infra.database import db
+from infra.partitioning import (
+    CHUNK_COLUMNS,
+    add_category_partition,
+    apply_change_log,
+    create_partition_index,
+    create_partitioned_chunks,
+    get_change_log_position,
+    get_partitioning_scheme,
+    install_change_log,
+    list_partitions,
+    remove_change_log,
+    run_locked,
+    split_hash_partition,
+    trim_change_log,
+)
+
+STAGING_TABLE = "chunks_partitioned"
+LEGACY_TABLE = "chunks_legacy"
+MIGRATION_LOG = "chunks_migration_log"
+
+
+def show_status(conn):
+    with conn.cursor() as cur:
+        scheme = get_partitioning_scheme(cur)
+        if not scheme:
+            print("'chunks' is not partitioned.")
+            return
+        print(f"'chunks' is {scheme}-partitioned:")
+        for partition in list_partitions(cur):
+            cur.execute(
+                "SELECT reltuples::bigint, pg_total_relation_size(oid) FROM pg_class WHERE oid = to_regclass(%s)",
+                (partition,)
+            )
+            rows, size = cur.fetchone()
+            print(f"  {partition}: ~{max(rows, 0)} rows, {size / 1024 / 1024:.1f} MB")
+
+
+def migrate(conn, scheme: str, partitions: int, categories: List[str], batch_size: int, drop_legacy: bool):
+    """
+    Moves the plain chunks table into a partitioned one while it stays in use.
+
+    A trigger logs the id of every chunk written or deleted from the start of
+    the migration. Rows are then copied into a staging table in id-ordered
+    batches, each in its own transaction, the partition indexes are built, and
+    the logged changes are applied. Only the changes logged after that, and
+    the table swap, run while chunks is locked (see run_locked).
+    """
+    with conn.cursor() as cur:
+        if get_partitioning_scheme(cur):
+            print("'chunks' is already partitioned.")
+            return
+        cur.execute("SELECT to_regclass(%s)", (LEGACY_TABLE,))
+        if cur.fetchone()[0] is not None:
+            raise ValueError(f"'{LEGACY_TABLE}' already exists; drop it before migrating again")
+        cur.execute("SELECT to_regclass(%s)", (STAGING_TABLE,))
+        if cur.fetchone()[0] is not None:
+            print(f"Found '{STAGING_TABLE}' from an interrupted migration; dropping it and starting over...")
+            cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(STAGING_TABLE)))
+        remove_change_log(cur, "chunks", MIGRATION_LOG)
+        conn.commit()
+
+        try:
+            if scheme == "list" and not categories:
+                cur.execute("SELECT DISTINCT category FROM documents WHERE category IS NOT NULL ORDER BY category")
+                categories = [row[0] for row in cur.fetchall()]
+
+            print(f"Creating staging table '{STAGING_TABLE}'...")
+            # The log must exist before max_id is read so that no later write is missed.
+            install_change_log(cur, "chunks", MIGRATION_LOG)
+            create_partitioned_chunks(cur, STAGING_TABLE, scheme, partitions, categories, with_index=False)
+            conn.commit()
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM chunks")
+            max_id = cur.fetchone()[0]
+            conn.commit()
+
+            # Take category from documents so this works before chunks.category has been backfilled.
+            source_rows = sql.SQL("""
+                SELECT c.id, c.document_id, d.category, c.chunk_text, c.embedding
+                FROM chunks c
+                JOIN documents d ON c.document_id = d.id
+            """)
+            copy_rows = sql.SQL("INSERT INTO {} ({}) {} WHERE c.id > %s AND c.id <= %s").format(
+                sql.Identifier(STAGING_TABLE), sql.SQL(", ").join(map(sql.Identifier, CHUNK_COLUMNS)), source_rows
+            )
+
+            last_id = 0
+            while last_id < max_id:
+                cur.execute(copy_rows, (last_id, last_id + batch_size))
+                conn.commit()
+                last_id += batch_size
+                print(f"  copied rows up to id {min(last_id, max_id)} of {max_id}")
+
+            print("Building partition indexes...")
+            for partition in list_partitions(cur, STAGING_TABLE):
+                create_partition_index(cur, partition)
+                conn.commit()
+                print(f"  indexed {partition}")
+
+            print("Applying changes made during the copy...")
+            position = get_change_log_position(cur, MIGRATION_LOG)
+            apply_change_log(cur, MIGRATION_LOG, STAGING_TABLE, source_rows, position)
+            trim_change_log(cur, MIGRATION_LOG, position)
+            conn.commit()
+
+            def swap(cur):
+                apply_change_log(cur, MIGRATION_LOG, STAGING_TABLE, source_rows, get_change_log_position(cur, MIGRATION_LOG))
+                remove_change_log(cur, "chunks", MIGRATION_LOG)
+                cur.execute(sql.SQL("ALTER TABLE chunks RENAME TO {}").format(sql.Identifier(LEGACY_TABLE)))
+                cur.execute(sql.SQL("ALTER TABLE {} RENAME TO chunks").format(sql.Identifier(STAGING_TABLE)))
+                cur.execute("ALTER SEQUENCE chunks_id_seq OWNED BY chunks.id")
+                if drop_legacy:
+                    cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(LEGACY_TABLE)))
+
+            print("Swapping tables...")
+            run_locked(conn, "chunks", swap)
+        except Exception:
+            # Stop logging writes to chunks; the staging table is dropped by the next run.
+            conn.rollback()
+            remove_change_log(cur, "chunks", MIGRATION_LOG)
+            conn.commit()
+            raise
+
+    print("✅ Migration complete!" + ("" if drop_legacy else f" The old table is kept as '{LEGACY_TABLE}'."))
+
+
+def add_category(conn, category: str):
+    with conn.cursor() as cur:
+        if get_partitioning_scheme(cur) != "list":
+            raise ValueError("'chunks' is not list-partitioned by category")
+    name = add_category_partition(conn, "chunks", category)
+    print(f"✅ Added partition {name}")
+
+
+def split_partition(conn, partition: str):
+    with conn.cursor() as cur:
+        if get_partitioning_scheme(cur) != "hash":
+            raise ValueError("'chunks' is not hash-partitioned by document_id")
+    names = split_hash_partition(conn, "chunks", partition)
+    print(f"✅ Split {partition} into {', '.join(names)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage partitioning of the chunks table.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("status", help="Show partitions and their sizes")
+
+    migrate_parser = subparsers.add_parser("migrate", help="Migrate the plain chunks table to a partitioned one")
+    migrate_parser.add_argument("--scheme", choices=["hash", "list"], default=config.CHUNKS_PARTITIONING or "hash")
+    migrate_parser.add_argument("--partitions", type=int, default=config.CHUNKS_HASH_PARTITIONS,
+                                help="Number of hash partitions")
+    migrate_parser.add_argument("--categories", default="",
+                                help="Comma-separated categories for list partitions (default: all existing)")
+    migrate_parser.add_argument("--batch-size", type=int, default=10000, help="Rows copied per transaction")
+    migrate_parser.add_argument("--drop-legacy", action="store_true", help="Drop the old table after the swap")
+
+    add_parser = subparsers.add_parser("add-category", help="Add a list partition for a category")
+    add_parser.add_argument("category")
+
+    split_parser = subparsers.add_parser("split", help="Split a hash partition in two")
+    split_parser.add_argument("partition")
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        if args.partitions < 1:
+            parser.error("--partitions must be 1 or greater")
+        if args.batch_size < 1:
+            parser.error("--batch-size must be 1 or greater")
+
+    conn = db.connect()
+    try:
+        if args.command == "status":
+            show_status(conn)
+        elif args.command == "migrate":
+            categories = [c.strip() for c in args.categories.split(",") if c.strip()]
+            migrate(conn, args.scheme, args.partitions, categories, args.batch_size, args.drop_legacy)
+        elif args.command == "add-category":
+            add_category(conn, args.category)
+        elif args.command == "split":
+            split_partition(conn, args.partition)
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ An error occurred: {e}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
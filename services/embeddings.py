@@ -24,6 +24,18 @@ class EmbeddingService:
         )
         return result['embedding']
     
+    def generate_query_embeddings_batch(self, queries: List[str]) -> List[List[float]]:
+        # embed_content accepts a list of texts, so send EMBEDDING_BATCH_SIZE queries per request.
+        embeddings = []
+        for start in range(0, len(queries), config.EMBEDDING_BATCH_SIZE):
+            result = genai.embed_content(
+                model=self.model,
+                content=queries[start:start + config.EMBEDDING_BATCH_SIZE],
+                task_type="retrieval_query"
+            )
+            embeddings.extend(result['embedding'])
+        return embeddings
+    
     def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
         embeddings = []
         for text in texts:
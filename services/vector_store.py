@@ -1,9 +1,20 @@
+import heapq
+import itertools
+import psycopg
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
+from pgvector import Vector
+from psycopg import sql
+from config import config
 from infra.database import db
+from infra.partitioning import list_partitions
 from services.embeddings import embedding_service
 import json
 
 class VectorStore:
+    def __init__(self):
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
     def store_document(self, filename: str, file_type: str, category: str, file_hash: str) -> int:
         conn = None
         try:
@@ -47,51 +58,121 @@ class VectorStore:
             conn = db.connect()
             with conn.cursor() as cur:
                 for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+                    # category is denormalised onto chunks so they can be list-partitioned by it.
                     cur.execute(
                         """
-                        INSERT INTO chunks (document_id, chunk_text, embedding)
-                        VALUES (%s, %s, %s)
+                        INSERT INTO chunks (document_id, category, chunk_text, embedding)
+                        SELECT d.id, d.category, %s, %s
+                        FROM documents d
+                        WHERE d.id = %s
                         """,
-                        (document_id, chunk, embedding)
+                        (chunk, embedding, document_id)
                     )
+                    if cur.rowcount == 0:
+                        raise Exception(f"Document {document_id} does not exist")
                 conn.commit()
         except Exception as e:
             if conn and not conn.closed:
                 conn.rollback()
             raise Exception(f"Database error while storing chunks: {str(e)}")
     
-    def search_similar(self, query_embedding: List[float], top_k: int = 5) -> List[Dict]:
-        try:
-            conn = db.connect()
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT 
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=config.SEARCH_FANOUT_WORKERS)
+        return self._executor
+    
+    def _load_partitions(self) -> List[str]:
+        with db.thread_connection().cursor() as cur:
+            return list_partitions(cur)
+    
+    def _get_search_tables(self) -> List[str]:
+        """The partitions of chunks, or chunks itself when it is not partitioned."""
+        # Re-read on every search (on a fan-out worker, so callers' threads don't each open a
+        # connection) so that partitions added by add-category or split are searched straight away.
+        return self._get_executor().submit(self._load_partitions).result() or ["chunks"]
+    
+    def _search_table(self, table: str, query_embeddings: List[List[float]], top_k: int, ef_search: Optional[int]) -> List[List[Dict]]:
+        conn = db.thread_connection()
+        with conn.transaction(), conn.cursor() as cur:
+            if ef_search is not None:
+                # Transaction-local, so it does not leak into other searches on this worker.
+                cur.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+            cur.execute(
+                sql.SQL("""
+                SELECT
+                    q.idx,
+                    r.id,
+                    r.chunk_text,
+                    r.filename,
+                    r.category,
+                    r.similarity
+                FROM unnest(%s::vector[]) WITH ORDINALITY AS q(embedding, idx)
+                CROSS JOIN LATERAL (
+                    SELECT
                         c.id,
                         c.chunk_text,
                         d.filename,
                         d.category,
-                        1 - (c.embedding <=> %s::vector) as similarity
-                    FROM chunks c
+                        1 - (c.embedding <=> q.embedding) as similarity
+                    FROM {} c
                     JOIN documents d ON c.document_id = d.id
-                    ORDER BY c.embedding <=> %s::vector
+                    ORDER BY c.embedding <=> q.embedding
                     LIMIT %s
-                    """,
-                    (query_embedding, query_embedding, top_k)
-                )
-                results = []
-                for row in cur.fetchall():
-                    results.append({
-                        "chunk_id": row[0],
-                        "text": row[1],
-                        "filename": row[2],
-                        "category": row[3],
-                        "similarity": float(row[4])
-                    })
-                return results
+                ) r
+                ORDER BY q.idx, r.similarity DESC
+                """).format(sql.Identifier(table)),
+                ([Vector(embedding) for embedding in query_embeddings], top_k)
+            )
+            results: List[List[Dict]] = [[] for _ in query_embeddings]
+            for row in cur.fetchall():
+                results[row[0] - 1].append({
+                    "chunk_id": row[1],
+                    "text": row[2],
+                    "filename": row[3],
+                    "category": row[4],
+                    "similarity": float(row[5])
+                })
+            return results
+    
+    def _search_tables(self, tables: List[str], query_embeddings: List[List[float]], top_k: int, ef_search: Optional[int]) -> List[List[Dict]]:
+        # Search every partition's ANN index in parallel, then merge the per-partition top-k of each query.
+        futures = [
+            self._get_executor().submit(self._search_table, table, query_embeddings, top_k, ef_search)
+            for table in tables
+        ]
+        partial_results = [future.result() for future in futures]
+        return [
+            heapq.nlargest(top_k, itertools.chain.from_iterable(partial[idx] for partial in partial_results), key=lambda r: r["similarity"])
+            for idx in range(len(query_embeddings))
+        ]
+    
+    def _search(self, query_embeddings: List[List[float]], top_k: int, ef_search: Optional[int]) -> List[List[Dict]]:
+        try:
+            return self._search_tables(self._get_search_tables(), query_embeddings, top_k, ef_search)
+        except psycopg.errors.UndefinedTable:
+            # A partition was split away or swapped out between listing and searching it.
+            return self._search_tables(self._get_search_tables(), query_embeddings, top_k, ef_search)
+    
+    def search_similar(self, query_embedding: List[float], top_k: int = 5, ef_search: Optional[int] = None) -> List[Dict]:
+        try:
+            return self._search([query_embedding], top_k, ef_search)[0]
         except Exception as e:
             raise Exception(f"Database error during similarity search: {str(e)}")
     
+    def search_similar_batch(self, query_embeddings: List[List[float]], top_k: int = 5, ef_search: Optional[int] = None) -> List[List[Dict]]:
+        """Runs one similarity search per query embedding in a single statement per partition.
+
+        Results are returned in the same order as query_embeddings. Like
+        search_similar, it fans out over the partitions of chunks. ef_search
+        overrides hnsw.ef_search for this call only.
+        """
+        if not query_embeddings:
+            return []
+        try:
+            return self._search(query_embeddings, top_k, ef_search)
+        except Exception as e:
+            raise Exception(f"Database error during batch similarity search: {str(e)}")
+
     def get_all_documents(self) -> List[Dict]:
         conn = db.connect()
         with conn.cursor() as cur: